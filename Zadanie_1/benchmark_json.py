@@ -0,0 +1,49 @@
+import itertools
+import time
+
+import import_data
+from import_data import CONVERSATIONS_FILE, load_json_backend, prefilter_conversation
+
+BENCHMARK_LINES = 200000
+BACKENDS = ['json', 'ujson', 'orjson', 'simdjson']
+
+
+def benchmark(lines: list[str]):
+    print(f"{'backend':<28}{'records/s':>12}{'total_s':>10}")
+    for name, lazy in itertools.product(BACKENDS, [False, True]):
+        try:
+            backend, _, decode_conversation = load_json_backend(name, lazy)
+        except ImportError:
+            continue
+
+        started = time.perf_counter()
+        for line in lines:
+            decode_conversation(line)
+        duration = time.perf_counter() - started
+
+        print(f"{backend:<28}{len(lines) / duration:>12.0f}{duration:>10.2f}")
+
+def benchmark_prefilter(lines: list[str]):
+    import_data.unique_conversations.clear()
+    decode_conversation = import_data.decode_conversation
+
+    started = time.perf_counter()
+    for line in lines:
+        decode_conversation(line)
+    decoded = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for line in lines:
+        prefilter_conversation(decode_conversation(line))
+    prefiltered = time.perf_counter() - started
+
+    print(f"\n{'stage':<28}{'us/record':>12}{'total_s':>10}")
+    print(f"{'decode':<28}{decoded / len(lines) * 10**6:>12.2f}{decoded:>10.2f}")
+    print(f"{'decode + prefilter':<28}{prefiltered / len(lines) * 10**6:>12.2f}{prefiltered:>10.2f}")
+
+
+if __name__ == "__main__":
+    with open(CONVERSATIONS_FILE, "r", encoding='utf-8') as file:
+        lines = list(itertools.islice(file, BENCHMARK_LINES))
+    benchmark(lines)
+    benchmark_prefilter(lines)
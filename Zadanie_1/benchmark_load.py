@@ -0,0 +1,225 @@
+import calendar
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy.sql import text
+
+import import_data
+from import_data import LOAD_ORDER, LOAD_TARGETS, ORDER_KEYS, TABLE_COLUMNS, IncrementalCSVWriter, StreamAggregates
+
+PG_BIN = ''
+BENCHMARK_SEED = 2022
+BENCHMARK_CONVERSATIONS = 200000
+BENCHMARK_AUTHORS = 20000
+BENCHMARK_HASHTAGS = 5000
+BENCHMARK_URLS = 20000
+BENCHMARK_DOMAINS = 88
+BENCHMARK_ENTITIES = 2000
+BENCHMARK_SHARD_SIZE = 16 * 1024 * 1024
+BENCHMARK_RESULTS = 'benchmark_load.csv'
+SERVER_SETTINGS = {
+    "shared_buffers": "512MB",
+    "max_wal_size": "8GB",
+    "checkpoint_timeout": "30min",
+    "maintenance_work_mem": "1GB",
+}
+STRATEGIES = {
+    "serial": {"COPY_WORKERS": 1},
+    "parallel": {"COPY_WORKERS": 4},
+    "ordered": {"COPY_WORKERS": 4, "ORDER_LOADS": True},
+}
+
+LANGUAGES = ["en", "uk", "ru", "de", "sk", "pl", "fr", "es"]
+SOURCES = ["Twitter for iPhone", "Twitter for Android", "Twitter Web App", "TweetDeck"]
+REFERENCE_TYPES = ["replied_to", "quoted", "retweeted"]
+WORDS = ["ukraine", "russia", "kyiv", "war", "peace", "support", "news", "today", "people", "city", "help", "stand"]
+
+
+class TemporaryCluster:
+    def __init__(self):
+        self.directory = None
+        self.port = None
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix='pdt-benchmark-')
+        with socket.socket() as probe:
+            probe.bind(('localhost', 0))
+            self.port = probe.getsockname()[1]
+
+        settings = " ".join(f"-c {name}={value}" for name, value in SERVER_SETTINGS.items())
+        subprocess.run([f'{PG_BIN}initdb', '-D', f'{self.directory}/data', '-U', 'postgres', '--auth=trust'], check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([
+            f'{PG_BIN}pg_ctl', '-D', f'{self.directory}/data', '-l', f'{self.directory}/server.log', '-w', 'start',
+            '-o', f"-p {self.port} -k {self.directory} -c listen_addresses='' {settings}"
+        ], check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([f'{PG_BIN}createdb', '-h', self.directory, '-p', str(self.port), '-U', 'postgres', 'PDT'], check=True)
+        return self
+
+    def url(self) -> str:
+        return f'postgresql+psycopg2://postgres@/PDT?host={self.directory}&port={self.port}'
+
+    def __exit__(self, *args, **kwargs):
+        subprocess.run([f'{PG_BIN}pg_ctl', '-D', f'{self.directory}/data', '-m', 'fast', '-w', 'stop'], stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def generate_shards(directory: str):
+    random.seed(BENCHMARK_SEED)
+    import_data.CSV_DIR = directory
+    import_data.SHARD_SIZE = BENCHMARK_SHARD_SIZE
+    aggregates = StreamAggregates()
+
+    def write(table: str, rows: list[list]):
+        with IncrementalCSVWriter(table, TABLE_COLUMNS[table]) as writer:
+            writer.writerows(rows)
+        aggregates.add_rows(table, rows)
+
+    write("languages", [[id, code] for id, code in enumerate(LANGUAGES, 1)])
+    write("sources", [[id, name] for id, name in enumerate(SOURCES, 1)])
+    write("reference_types", [[id, name] for id, name in enumerate(REFERENCE_TYPES, 1)])
+    write("hashtags", [[id, f'tag{id}'] for id in range(1, BENCHMARK_HASHTAGS + 1)])
+    write("urls", [[id, f'https://example.com/{id}', f'https://example.com/{id}?utm_source=benchmark', f'title {id}', None] for id in range(1, BENCHMARK_URLS + 1)])
+    write("context_domains", [[id, f'domain {id}', None] for id in range(1, BENCHMARK_DOMAINS + 1)])
+    write("context_entities", [[id, f'entity {id}', f'description {id}'] for id in range(1, BENCHMARK_ENTITIES + 1)])
+    write("authors", [
+        [id, f'name {id}', f'user{id}', None, random.randint(0, 10**6), random.randint(0, 5000), random.randint(0, 10**5), random.randint(0, 100)]
+        for id in range(1, BENCHMARK_AUTHORS + 1)
+    ])
+
+    ids = list(range(1, BENCHMARK_CONVERSATIONS + 1))
+    random.shuffle(ids)
+    started = calendar.timegm((2022, 2, 1, 0, 0, 0, 0, 0, 0))
+    tables = {table: [] for table in ["conversations", "conversation_references", "annotations", "links", "context_annotations", "conversation_hashtags"]}
+    for id in ids:
+        created_at = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(started + id * 30))
+        content = " ".join(random.choices(WORDS, k=random.randint(5, 40)))
+        tables["conversations"].append([
+            id, random.randint(1, BENCHMARK_AUTHORS), content, random.random() < 0.05,
+            random.randint(1, len(LANGUAGES)), random.randint(1, len(SOURCES)),
+            random.randint(0, 500), random.randint(0, 50), random.randint(0, 2000), random.randint(0, 20), created_at
+        ])
+        if id > 1 and random.random() < 0.7:
+            tables["conversation_references"].append([id, random.randint(1, id - 1), random.randint(1, len(REFERENCE_TYPES))])
+        for _ in range(random.randint(0, 2)):
+            tables["annotations"].append([id, random.choice(WORDS), "Place", round(random.random(), 3)])
+        if random.random() < 0.3:
+            tables["links"].append([id, random.randint(1, BENCHMARK_URLS)])
+        for _ in range(random.randint(0, 4)):
+            tables["context_annotations"].append([id, random.randint(1, BENCHMARK_DOMAINS), random.randint(1, BENCHMARK_ENTITIES)])
+        for hashtag_id in random.sample(range(1, BENCHMARK_HASHTAGS + 1), random.randint(0, 3)):
+            tables["conversation_hashtags"].append([id, hashtag_id])
+
+    for table, rows in tables.items():
+        write(table, rows)
+    aggregates.write()
+
+def wal_lsn(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT pg_current_wal_insert_lsn()")).scalar()
+
+def measure_table(engine, table: str, started_lsn, duration: float) -> list:
+    with engine.connect() as connection:
+        rows, wal_bytes, table_bytes, index_bytes = connection.execute(text(f"""
+            SELECT
+                (SELECT count(*) FROM public.{table}),
+                pg_wal_lsn_diff(pg_current_wal_insert_lsn(), :started_lsn),
+                pg_table_size('public.{table}'),
+                pg_indexes_size('public.{table}')
+        """), {"started_lsn": started_lsn}).first()
+
+    return [table, duration, rows, rows / max(duration, 0.001), wal_bytes / 2**20, table_bytes / 2**20, index_bytes / 2**20]
+
+def table_sizes(engine, tables: list[str]) -> dict:
+    with engine.connect() as connection:
+        return {
+            table: [size / 2**20 for size in connection.execute(text(f"SELECT pg_table_size('public.{table}'), pg_indexes_size('public.{table}')")).first()]
+            for table in tables
+        }
+
+def run_strategy(name: str) -> list[list]:
+    for setting, value in {"ORDER_LOADS": False, **STRATEGIES[name]}.items():
+        setattr(import_data, setting, value)
+
+    results = []
+    with TemporaryCluster() as cluster:
+        shard_directory = f'{cluster.directory}/csvs'
+        os.makedirs(shard_directory)
+        generate_shards(shard_directory)
+        import_data.DB_URL = cluster.url()
+        import_data.DEDUP_DIR = cluster.directory
+
+        if import_data.ORDER_LOADS:
+            started = time.perf_counter()
+            for table, column in ORDER_KEYS.items():
+                import_data.order_shards(table, column)
+            results.append(["(ordering)", time.perf_counter() - started, 0, 0, 0, 0, 0])
+
+        copier = import_data.DBCopier()
+        copier.db_init()
+        copier.disable_triggers()
+
+        for table in LOAD_ORDER:
+            started_lsn = wal_lsn(copier.engine)
+            started = time.perf_counter()
+            if table == "conversation_references":
+                copier.fill_references()
+                results.append(measure_table(copier.engine, table, started_lsn, time.perf_counter() - started))
+            elif table in LOAD_TARGETS:
+                if table == "hashtags":
+                    copier.create_hashtags_staging()
+                copier.fill_table(table, TABLE_COLUMNS[table], target=LOAD_TARGETS[table])
+                results.append(measure_table(copier.engine, LOAD_TARGETS[table], started_lsn, time.perf_counter() - started))
+            else:
+                copier.fill_table(table, TABLE_COLUMNS[table])
+                results.append(measure_table(copier.engine, table, started_lsn, time.perf_counter() - started))
+
+        started_lsn = wal_lsn(copier.engine)
+        started = time.perf_counter()
+        copier.finish_hashtags()
+        results.append(measure_table(copier.engine, "hashtags", started_lsn, time.perf_counter() - started))
+
+        started_lsn = wal_lsn(copier.engine)
+        started = time.perf_counter()
+        copier.create_indexes()
+        copier.enable_triggers()
+        duration = time.perf_counter() - started
+        with copier.engine.connect() as connection:
+            wal_bytes = connection.execute(text("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), :started_lsn)"), {"started_lsn": started_lsn}).scalar()
+
+        sizes = table_sizes(copier.engine, LOAD_ORDER)
+        for row in results:
+            if row[0] in sizes:
+                row[5], row[6] = sizes[row[0]]
+        results.append([
+            "(indexes)", duration, 0, 0, wal_bytes / 2**20,
+            sum(table_mb for table_mb, _ in sizes.values()), sum(index_mb for _, index_mb in sizes.values())
+        ])
+        copier.engine.dispose()
+
+    return results
+
+def report(name: str, results: list[list]):
+    print(f"\n{name}")
+    print(f"{'table':<28}{'seconds':>10}{'rows':>10}{'rows/s':>12}{'wal_mb':>10}{'table_mb':>10}{'index_mb':>10}")
+    for table, duration, rows, rate, wal_mb, table_mb, index_mb in results:
+        print(f"{table:<28}{duration:>10.2f}{rows:>10}{rate:>12.0f}{wal_mb:>10.1f}{table_mb:>10.1f}{index_mb:>10.1f}")
+    print(f"{'total':<28}{sum(row[1] for row in results):>10.2f}{'':>10}{'':>12}{sum(row[4] for row in results):>10.1f}")
+
+    new_file = not os.path.exists(BENCHMARK_RESULTS)
+    with open(BENCHMARK_RESULTS, 'a', encoding='utf-8') as file:
+        if new_file:
+            file.write("timestamp;strategy;table;seconds;rows;rows_per_s;wal_mb;table_mb;index_mb\n")
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        for row in results:
+            file.write(";".join([timestamp, name] + [f"{value:.3f}" if isinstance(value, float) else str(value) for value in row]) + "\n")
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(STRATEGIES):
+        report(name, run_strategy(name))
@@ -0,0 +1,206 @@
+import gzip
+import json
+import logging
+import sys
+import time
+
+from sqlalchemy import create_engine
+
+from import_data import DB_URL
+
+EXPORT_FILE = 'export.jsonl.gz'
+EXPORT_BATCH_SIZE = 50000
+EXPORT_COMPRESSLEVEL = 1
+EXPORT_FROM = None
+EXPORT_TO = None
+EXPORT_LANGUAGES = []
+
+CREATED_AT = """to_char(conversations_view.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"')"""
+
+CHILD_QUERIES = {
+    "hashtags": """
+        SELECT conversation_hashtags.conversation_id, hashtags.tag
+        FROM public.conversation_hashtags
+        JOIN public.hashtags ON hashtags.id = conversation_hashtags.hashtag_id
+        {join}
+        ORDER BY conversation_hashtags.conversation_id, conversation_hashtags.id
+    """,
+    "annotations": """
+        SELECT annotations.conversation_id, annotations.value, annotations.type, annotations.probability::float8
+        FROM public.annotations
+        {join}
+        ORDER BY annotations.conversation_id, annotations.id
+    """,
+    "urls": """
+        SELECT links.conversation_id, urls.expanded_url, urls.title, urls.description
+        FROM public.links
+        JOIN public.urls ON urls.id = links.url_id
+        {join}
+        ORDER BY links.conversation_id, links.id
+    """,
+    "context_annotations": """
+        SELECT context_annotations.conversation_id,
+            context_domains.id, context_domains.name, context_domains.description,
+            context_entities.id, context_entities.name, context_entities.description
+        FROM public.context_annotations
+        JOIN public.context_domains ON context_domains.id = context_annotations.context_domain_id
+        JOIN public.context_entities ON context_entities.id = context_annotations.context_entity_id
+        {join}
+        ORDER BY context_annotations.conversation_id, context_annotations.id
+    """,
+    "referenced_tweets": """
+        SELECT conversation_references.conversation_id, reference_types.name, conversation_references.parent_id
+        FROM public.conversation_references
+        JOIN public.reference_types ON reference_types.id = conversation_references.type_id
+        {join}
+        ORDER BY conversation_references.conversation_id, conversation_references.id
+    """,
+}
+CHILD_TABLES = {
+    "hashtags": "conversation_hashtags",
+    "annotations": "annotations",
+    "urls": "links",
+    "context_annotations": "context_annotations",
+    "referenced_tweets": "conversation_references",
+}
+
+logger = logging.getLogger("export_data")
+
+try:
+    import orjson
+
+    def encode(record: dict) -> bytes:
+        return orjson.dumps(record) + b"\n"
+except ImportError:
+    def encode(record: dict) -> bytes:
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+class SortedStream:
+    def __init__(self, cursor):
+        self.rows = iter(cursor)
+        self.current = next(self.rows, None)
+
+    def take(self, id: int) -> list:
+        while self.current is not None and self.current[0] < id:
+            self.current = next(self.rows, None)
+
+        rows = []
+        while self.current is not None and self.current[0] == id:
+            rows.append(self.current)
+            self.current = next(self.rows, None)
+        return rows
+
+
+def export_filter() -> tuple[str, dict]:
+    conditions = []
+    parameters = {}
+    if EXPORT_FROM:
+        conditions.append("conversations_view.created_at >= %(export_from)s")
+        parameters["export_from"] = EXPORT_FROM
+    if EXPORT_TO:
+        conditions.append("conversations_view.created_at < %(export_to)s")
+        parameters["export_to"] = EXPORT_TO
+    if EXPORT_LANGUAGES:
+        conditions.append("conversations_view.language = ANY(%(export_languages)s)")
+        parameters["export_languages"] = list(EXPORT_LANGUAGES)
+
+    return " AND ".join(conditions), parameters
+
+def open_stream(connection, name: str, query: str, parameters: dict):
+    cursor = connection.cursor(name=name)
+    cursor.itersize = EXPORT_BATCH_SIZE
+    cursor.execute(query, parameters)
+    return cursor
+
+def rebuild_conversation(row: tuple, children: dict) -> dict:
+    id, author_id, text, possibly_sensitive, lang, source, retweet_count, reply_count, like_count, quote_count, created_at = row
+    record = {
+        "id": str(id),
+        "author_id": str(author_id),
+        "text": text,
+        "possibly_sensitive": possibly_sensitive,
+        "lang": lang,
+        "source": source,
+    }
+    if any(value is not None for value in (retweet_count, reply_count, like_count, quote_count)):
+        record["public_metrics"] = {"retweet_count": retweet_count, "reply_count": reply_count, "like_count": like_count, "quote_count": quote_count}
+    record["created_at"] = created_at
+
+    if children["referenced_tweets"]:
+        record["referenced_tweets"] = [{"type": type, "id": str(parent_id)} for _, type, parent_id in children["referenced_tweets"]]
+
+    entities = {}
+    if children["annotations"]:
+        entities["annotations"] = [
+            {"normalized_text": "" if value == '""' else value, "type": "" if type == '""' else type, "probability": probability}
+            for _, value, type, probability in children["annotations"]
+        ]
+    if children["urls"]:
+        entities["urls"] = [
+            {key: value for key, value in (("expanded_url", url), ("title", title), ("description", description)) if value is not None}
+            for _, url, title, description in children["urls"]
+        ]
+    if children["hashtags"]:
+        entities["hashtags"] = [{"tag": tag} for _, tag in children["hashtags"]]
+    if entities:
+        record["entities"] = entities
+
+    if children["context_annotations"]:
+        record["context_annotations"] = [
+            {
+                "domain": {key: value for key, value in (("id", str(domain_id)), ("name", domain_name), ("description", domain_description)) if value is not None},
+                "entity": {key: value for key, value in (("id", str(entity_id)), ("name", entity_name), ("description", entity_description)) if value is not None},
+            }
+            for _, domain_id, domain_name, domain_description, entity_id, entity_name, entity_description in children["context_annotations"]
+        ]
+
+    return record
+
+def export_conversations(engine, path: str) -> int:
+    condition, parameters = export_filter()
+    connection = engine.raw_connection()
+    try:
+        conversations = open_stream(connection, "export_conversations", f"""
+            SELECT conversations_view.id, conversations_view.author_id, conversations_view.content, conversations_view.possibly_sensitive,
+                conversations_view.language, conversations_view.source, conversations_view.retweet_count, conversations_view.reply_count,
+                conversations_view.like_count, conversations_view.quote_count, {CREATED_AT}
+            FROM public.conversations_view
+            {"WHERE " + condition if condition else ""}
+            ORDER BY conversations_view.id
+        """, parameters)
+
+        streams = {}
+        for field, query in CHILD_QUERIES.items():
+            join = ""
+            if condition:
+                table = CHILD_TABLES[field]
+                join = f"JOIN public.conversations_view ON conversations_view.id = {table}.conversation_id WHERE {condition}"
+            streams[field] = SortedStream(open_stream(connection, f"export_{field}", query.format(join=join), parameters))
+
+        exported = 0
+        started = time.time()
+        with gzip.open(path, 'wb', compresslevel=EXPORT_COMPRESSLEVEL) as output:
+            batch = []
+            for row in conversations:
+                children = {field: stream.take(row[0]) for field, stream in streams.items()}
+                batch.append(encode(rebuild_conversation(row, children)))
+                if len(batch) >= EXPORT_BATCH_SIZE:
+                    output.write(b"".join(batch))
+                    exported += len(batch)
+                    batch = []
+                    logger.info("%d conversations, %.0f/s", exported, exported / (time.time() - started))
+
+            output.write(b"".join(batch))
+            exported += len(batch)
+
+        connection.commit()
+        return exported
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    path = sys.argv[1] if len(sys.argv) > 1 else EXPORT_FILE
+    logger.info("exported %d conversations to %s", export_conversations(create_engine(DB_URL), path), path)
@@ -0,0 +1,153 @@
+import csv
+import heapq
+import os
+import sys
+
+import import_data
+from import_data import AGGREGATES, IncrementalCSVWriter, TABLE_COLUMNS, aggregates, read_shards, stable_id
+
+INSTANCES_DIR = './instances'
+
+CONVERSATION_TABLES = ["conversations", "conversation_references", "annotations", "links", "context_annotations", "conversation_hashtags"]
+DICTIONARY_TABLES = ["languages", "sources", "reference_types"]
+REMAPPED_COLUMNS = {
+    "conversations": {4: "languages", 5: "sources"},
+    "conversation_references": {2: "reference_types"},
+    "conversation_hashtags": {1: "hashtags"},
+}
+
+
+def read_summary(instance: str, table: str):
+    with open(f'{instance}/{table}.ids', 'r', newline='', encoding='utf-8') as file:
+        for row in csv.reader(file, delimiter="|", escapechar="~"):
+            yield int(row[0]), row[1:]
+
+def duplicate_ids(instances: list[str], table: str, prefer=None) -> list[set]:
+    dropped = [set() for _ in instances]
+    summaries = [
+        ((id, index, values) for id, values in read_summary(instance, table))
+        for index, instance in enumerate(instances)
+    ]
+
+    group = []
+    for item in heapq.merge(*summaries, key=lambda item: (item[0], item[1])):
+        if group and group[0][0] != item[0]:
+            drop_losers(group, dropped, prefer)
+            group = []
+        group.append(item)
+    if group:
+        drop_losers(group, dropped, prefer)
+
+    return dropped
+
+def drop_losers(group: list, dropped: list[set], prefer):
+    if len(group) == 1:
+        return
+
+    winner = next((item for item in group if prefer and prefer(item[2])), group[0])
+    for item in group:
+        if item is not winner:
+            dropped[item[1]].add(item[0])
+
+def remap_dictionary(instance: str, table: str, dictionary: dict, writer: IncrementalCSVWriter) -> dict:
+    remap = {}
+    for id, value in read_shards(instance, table):
+        if value not in dictionary:
+            dictionary[value] = len(dictionary) + 1
+            writer.writerows([[dictionary[value], value]])
+        remap[id] = dictionary[value]
+
+    return remap
+
+def remap_hashtags(instance: str, registry: dict, writer: IncrementalCSVWriter) -> dict:
+    remap = {}
+    for id, tag in read_shards(instance, "hashtags"):
+        new_id, new = stable_id(tag, registry)
+        if new:
+            writer.writerows([[new_id, tag]])
+        remap[id] = new_id
+
+    return remap
+
+def merge_instances(instances: list[str]):
+    dropped_conversations = duplicate_ids(instances, "conversations")
+    dropped_authors = duplicate_ids(instances, "authors", prefer=lambda values: values[0] == '1')
+
+    dictionaries = {table: {} for table in DICTIONARY_TABLES}
+    hashtag_ids = {}
+    seen_domains = set()
+    seen_entities = set()
+    seen_urls = set()
+
+    with (
+        IncrementalCSVWriter("authors", TABLE_COLUMNS["authors"]) as authors_writer,
+        IncrementalCSVWriter("conversations", TABLE_COLUMNS["conversations"]) as conversations_writer,
+        IncrementalCSVWriter("conversation_references", TABLE_COLUMNS["conversation_references"]) as conversation_references_writer,
+        IncrementalCSVWriter("annotations", TABLE_COLUMNS["annotations"]) as annotations_writer,
+        IncrementalCSVWriter("links", TABLE_COLUMNS["links"]) as links_writer,
+        IncrementalCSVWriter("context_annotations", TABLE_COLUMNS["context_annotations"]) as context_annotations_writer,
+        IncrementalCSVWriter("context_domains", TABLE_COLUMNS["context_domains"]) as context_domains_writer,
+        IncrementalCSVWriter("context_entities", TABLE_COLUMNS["context_entities"]) as context_entities_writer,
+        IncrementalCSVWriter("conversation_hashtags", TABLE_COLUMNS["conversation_hashtags"]) as conversation_hashtags_writer,
+        IncrementalCSVWriter("hashtags", TABLE_COLUMNS["hashtags"]) as hashtags_writer,
+        IncrementalCSVWriter("languages", TABLE_COLUMNS["languages"]) as languages_writer,
+        IncrementalCSVWriter("sources", TABLE_COLUMNS["sources"]) as sources_writer,
+        IncrementalCSVWriter("reference_types", TABLE_COLUMNS["reference_types"]) as reference_types_writer,
+        IncrementalCSVWriter("urls", TABLE_COLUMNS["urls"]) as urls_writer,
+    ):
+        conversation_writers = {
+            "conversations": conversations_writer,
+            "conversation_references": conversation_references_writer,
+            "annotations": annotations_writer,
+            "links": links_writer,
+            "context_annotations": context_annotations_writer,
+            "conversation_hashtags": conversation_hashtags_writer,
+        }
+        dictionary_writers = {
+            "languages": languages_writer,
+            "sources": sources_writer,
+            "reference_types": reference_types_writer,
+        }
+
+        for index, instance in enumerate(instances):
+            dropped = dropped_conversations[index]
+
+            authors_writer.writerows([row for row in read_shards(instance, "authors") if int(row[0]) not in dropped_authors[index]])
+
+            remaps = {table: remap_dictionary(instance, table, dictionaries[table], dictionary_writers[table]) for table in DICTIONARY_TABLES}
+            remaps["hashtags"] = remap_hashtags(instance, hashtag_ids, hashtags_writer)
+
+            for table in CONVERSATION_TABLES:
+                writer = conversation_writers[table]
+                columns = REMAPPED_COLUMNS.get(table, {})
+                for row in read_shards(instance, table):
+                    if int(row[0]) not in dropped:
+                        for column, dictionary in columns.items():
+                            row[column] = remaps[dictionary][row[column]]
+                        writer.writerows([row])
+                        if AGGREGATES:
+                            aggregates.add_rows(table, [row])
+
+            for row in read_shards(instance, "context_domains"):
+                if row[0] not in seen_domains:
+                    seen_domains.add(row[0])
+                    context_domains_writer.writerows([row])
+
+            for row in read_shards(instance, "context_entities"):
+                if row[0] not in seen_entities:
+                    seen_entities.add(row[0])
+                    context_entities_writer.writerows([row])
+
+            for row in read_shards(instance, "urls"):
+                if row[0] not in seen_urls:
+                    seen_urls.add(row[0])
+                    urls_writer.writerows([row])
+
+    if AGGREGATES:
+        aggregates.write()
+
+
+if __name__ == "__main__":
+    instances = sys.argv[1:] or sorted(f'{INSTANCES_DIR}/{name}' for name in os.listdir(INSTANCES_DIR))
+    os.makedirs(import_data.CSV_DIR, exist_ok=True)
+    merge_instances(instances)
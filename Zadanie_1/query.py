@@ -0,0 +1,215 @@
+import statistics
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import create_engine
+from sqlalchemy.sql import text
+
+from import_data import DB_URL
+
+QUERY_POOL_SIZE = 10
+QUERY_MAX_OVERFLOW = 20
+QUERY_POOL_RECYCLE = 30 * 60
+QUERY_STATEMENT_TIMEOUT = '10s'
+QUERY_BATCH_SIZE = 1000
+QUERY_CACHE_SIZE = 10000
+QUERY_CACHE_TTL = 60
+QUERY_LIMIT = 50
+
+BENCHMARK_REPEATS = 5
+BENCHMARK_BATCH = 500
+
+QUERY_INDEXES = {
+    "conversations_author_id_created_at_idx": "public.conversations USING btree (author_id, created_at DESC)",
+    "conversation_hashtags_hashtag_id_conversation_id_idx": "public.conversation_hashtags USING btree (hashtag_id, conversation_id)",
+    "conversation_hashtags_conversation_id_idx": "public.conversation_hashtags USING btree (conversation_id)",
+    "annotations_conversation_id_idx": "public.annotations USING btree (conversation_id)",
+    "links_conversation_id_idx": "public.links USING btree (conversation_id)",
+    "context_annotations_conversation_id_idx": "public.context_annotations USING btree (conversation_id)",
+    "conversation_references_conversation_id_idx": "public.conversation_references USING btree (conversation_id)",
+}
+
+CONVERSATION_COLUMNS = """
+    conversations_view.id, conversations_view.author_id, conversations_view.content, conversations_view.possibly_sensitive,
+    conversations_view.language, conversations_view.source, conversations_view.retweet_count, conversations_view.reply_count,
+    conversations_view.like_count, conversations_view.quote_count, conversations_view.created_at
+"""
+
+STATEMENTS = {
+    "conversations_by_id": f"""
+        SELECT {CONVERSATION_COLUMNS},
+            (SELECT coalesce(json_agg(hashtags.tag), '[]')
+                FROM public.conversation_hashtags
+                JOIN public.hashtags ON hashtags.id = conversation_hashtags.hashtag_id
+                WHERE conversation_hashtags.conversation_id = conversations_view.id) AS hashtags,
+            (SELECT coalesce(json_agg(json_build_object('value', annotations.value, 'type', annotations.type, 'probability', annotations.probability)), '[]')
+                FROM public.annotations
+                WHERE annotations.conversation_id = conversations_view.id) AS annotations,
+            (SELECT coalesce(json_agg(json_build_object('url', links_view.url, 'title', links_view.title, 'description', links_view.description)), '[]')
+                FROM public.links_view
+                WHERE links_view.conversation_id = conversations_view.id) AS links,
+            (SELECT coalesce(json_agg(json_build_object('domain', context_domains.name, 'entity', context_entities.name)), '[]')
+                FROM public.context_annotations
+                JOIN public.context_domains ON context_domains.id = context_annotations.context_domain_id
+                JOIN public.context_entities ON context_entities.id = context_annotations.context_entity_id
+                WHERE context_annotations.conversation_id = conversations_view.id) AS context_annotations,
+            (SELECT coalesce(json_agg(json_build_object('id', conversation_references_view.parent_id, 'type', conversation_references_view.type)), '[]')
+                FROM public.conversation_references_view
+                WHERE conversation_references_view.conversation_id = conversations_view.id) AS referenced_tweets
+        FROM public.conversations_view
+        WHERE conversations_view.id = ANY($1::bigint[])
+    """,
+    "author_timeline": f"""
+        SELECT {CONVERSATION_COLUMNS}
+        FROM public.conversations_view
+        WHERE conversations_view.author_id = $1::bigint AND conversations_view.created_at < $2::timestamptz
+        ORDER BY conversations_view.created_at DESC
+        LIMIT $3::integer
+    """,
+    "hashtag_recent": f"""
+        SELECT {CONVERSATION_COLUMNS}
+        FROM public.hashtags
+        JOIN public.conversation_hashtags ON conversation_hashtags.hashtag_id = hashtags.id
+        JOIN public.conversations_view ON conversations_view.id = conversation_hashtags.conversation_id
+        WHERE hashtags.tag = $1::text AND conversations_view.created_at < $2::timestamptz
+        ORDER BY conversations_view.created_at DESC
+        LIMIT $3::integer
+    """,
+}
+
+
+class ResultCache:
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> tuple:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return False, None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class ConversationQueries:
+    def __init__(self, engine=None, cache: bool = True):
+        self.engine = engine or create_engine(
+            DB_URL,
+            pool_size=QUERY_POOL_SIZE,
+            max_overflow=QUERY_MAX_OVERFLOW,
+            pool_recycle=QUERY_POOL_RECYCLE,
+            pool_pre_ping=True,
+            connect_args={"options": f"-c statement_timeout={QUERY_STATEMENT_TIMEOUT}"},
+        )
+        self.cache = ResultCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL) if cache else None
+
+    def execute(self, name: str, *parameters) -> list[dict]:
+        with self.engine.connect() as connection:
+            prepared = connection.connection.info.setdefault("prepared", set())
+            if name not in prepared:
+                connection.exec_driver_sql(f"PREPARE {name} AS {STATEMENTS[name]}")
+                prepared.add(name)
+
+            result = connection.exec_driver_sql(f"EXECUTE {name}({', '.join(['%s'] * len(parameters))})", parameters)
+            return [dict(row._mapping) for row in result]
+
+    def cached(self, name: str, *parameters) -> list[dict]:
+        if self.cache is None:
+            return self.execute(name, *parameters)
+
+        hit, rows = self.cache.get((name, parameters))
+        if not hit:
+            rows = self.execute(name, *parameters)
+            self.cache.put((name, parameters), rows)
+        return rows
+
+    def conversations(self, ids: list[int]) -> dict:
+        found = {}
+        missing = []
+        for id in dict.fromkeys(ids):
+            hit, row = self.cache.get(("conversation", id)) if self.cache else (False, None)
+            if hit:
+                found[id] = row
+            else:
+                missing.append(id)
+
+        for start in range(0, len(missing), QUERY_BATCH_SIZE):
+            for row in self.execute("conversations_by_id", missing[start:start + QUERY_BATCH_SIZE]):
+                found[row["id"]] = row
+                if self.cache:
+                    self.cache.put(("conversation", row["id"]), row)
+
+        return found
+
+    def conversation(self, id: int) -> dict:
+        return self.conversations([id]).get(id)
+
+    def author_timeline(self, author_id: int, before: str = 'infinity', limit: int = QUERY_LIMIT) -> list[dict]:
+        return self.cached("author_timeline", author_id, before, limit)
+
+    def hashtag_recent(self, tag: str, before: str = 'infinity', limit: int = QUERY_LIMIT) -> list[dict]:
+        return self.cached("hashtag_recent", tag, before, limit)
+
+
+def create_query_indexes(engine):
+    for name, definition in QUERY_INDEXES.items():
+        with engine.begin() as transaction:
+            transaction.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+
+def benchmark(queries: ConversationQueries):
+    with queries.engine.connect() as connection:
+        ids = connection.execute(text("SELECT id FROM public.conversations TABLESAMPLE SYSTEM (0.1) LIMIT :limit"), {"limit": BENCHMARK_BATCH}).scalars().all()
+        author_id = connection.execute(text("SELECT author_id FROM public.author_activity ORDER BY conversation_count DESC LIMIT 1")).scalar()
+        tag = connection.execute(text("""
+            SELECT hashtags.tag FROM public.hashtag_usage
+            JOIN public.hashtags ON hashtags.id = hashtag_usage.hashtag_id
+            ORDER BY hashtag_usage.conversation_count DESC LIMIT 1
+        """)).scalar()
+
+    patterns = [
+        ("conversation", lambda: [queries.conversation(ids[0])]),
+        (f"conversations x{len(ids)}", lambda: list(queries.conversations(ids).values())),
+        ("author timeline", lambda: queries.author_timeline(author_id)),
+        ("hashtag recent", lambda: queries.hashtag_recent(tag)),
+    ]
+
+    print(f"{'pattern':<28}{'rows':>6}{'first_ms':>10}{'median_ms':>12}{'max_ms':>10}")
+    for name, run in patterns:
+        if queries.cache:
+            queries.cache.clear()
+
+        durations = []
+        for _ in range(BENCHMARK_REPEATS):
+            started = time.perf_counter()
+            rows = run()
+            durations.append((time.perf_counter() - started) * 1000)
+
+        print(f"{name:<28}{len(rows):>6}{durations[0]:>10.1f}{statistics.median(durations):>12.1f}{max(durations):>10.1f}")
+
+
+if __name__ == "__main__":
+    queries = ConversationQueries()
+    if "--create-indexes" in sys.argv:
+        create_query_indexes(queries.engine)
+    benchmark(queries)
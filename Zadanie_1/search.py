@@ -0,0 +1,66 @@
+import statistics
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.sql import text
+
+from import_data import DB_URL
+
+BENCHMARK_REPEATS = 5
+BENCHMARK_QUERIES = [
+    ("single term", "ukraine", None),
+    ("two terms", "ukraine russia", None),
+    ("phrase", '"stand with ukraine"', None),
+    ("or", "kyiv or kharkiv", None),
+    ("negation", "ukraine -russia", None),
+    ("language filter", "ukraine", "en"),
+    ("stemmed, language filter", "bombing cities", "en"),
+]
+
+search_configs = None
+
+
+def query_configs(connection) -> list[str]:
+    global search_configs
+    if search_configs is None:
+        search_configs = connection.execute(text("SELECT DISTINCT search_config::text FROM public.languages")).scalars().all()
+    return search_configs
+
+def search_conversations(engine, query: str, language: str = None, limit: int = 20) -> list:
+    with engine.connect() as connection:
+        if language:
+            configs = connection.execute(
+                text("SELECT search_config::text FROM public.languages WHERE code = :language"), {"language": language}
+            ).scalars().all() or ['simple']
+        else:
+            configs = query_configs(connection)
+
+        tsquery = " || ".join(f"websearch_to_tsquery(CAST(:config_{index} AS regconfig), :query)" for index in range(len(configs)))
+        parameters = {f"config_{index}": config for index, config in enumerate(configs)}
+
+        return connection.execute(text(f"""
+            SELECT conversations.id, conversations.author_id, conversations.content, conversations.created_at,
+                ts_rank(conversation_search.document, search.query) AS rank
+            FROM public.conversation_search
+            JOIN public.conversations ON conversations.id = conversation_search.conversation_id
+            CROSS JOIN (SELECT {tsquery} AS query) AS search
+            WHERE conversation_search.document @@ search.query
+            {"AND conversations.language_id = (SELECT id FROM public.languages WHERE code = :language)" if language else ""}
+            ORDER BY rank DESC
+            LIMIT :limit
+        """), {**parameters, "query": query, "language": language, "limit": limit}).fetchall()
+
+def benchmark(engine):
+    print(f"{'pattern':<28}{'rows':>6}{'median_ms':>12}{'max_ms':>10}")
+    for name, query, language in BENCHMARK_QUERIES:
+        durations = []
+        for _ in range(BENCHMARK_REPEATS):
+            started = time.perf_counter()
+            rows = search_conversations(engine, query, language)
+            durations.append((time.perf_counter() - started) * 1000)
+
+        print(f"{name:<28}{len(rows):>6}{statistics.median(durations):>12.1f}{max(durations):>10.1f}")
+
+
+if __name__ == "__main__":
+    benchmark(create_engine(DB_URL))